@@ -14,23 +14,37 @@ datetimes:  (Apr 2022) As of now, the meditation log entries have a
     as the datetime for the entry.  The 'dateString' key is a naive datetime
     that corresponds to the local time of the entry.  To get this datetime
     from the 'date' timestamp, use
-    datetime.datetime.utcfromtimestamp(entry['date'] // 1000).
+    datetime.datetime(1970, 1, 1) + timedelta(seconds=entry['date'] // 1000),
+    which is the same as datetime.datetime.utcfromtimestamp(entry['date'] // 1000)
+    (deprecated as of Python 3.12).
     Since the datetimes are naive, this works regardless of the timezone active
     when the meditation session was logged.  See check_datetimes_for_entry()
     for a way to test that this behavior is still intact.
 """
-import json
 import os
-import glob
+import sys
 import re
 import argparse
 import shutil
-from datetime import datetime, date, timedelta, time
-import tracemalloc
+import functools
+import calendar
+from bisect import bisect_left
+import heapq
+import mmap
+from operator import itemgetter
+from collections.abc import MutableMapping
+from datetime import datetime, date, timedelta
 
 from dateutil.parser import parse as parse_date
 from tabulate import tabulate
-import psutil
+try:
+    # orjson's api differs from the stdlib json, so only its loads is used, see _load_json
+    from orjson import loads as _loads
+    # orjson decodes from any buffer, so the log file can be memory mapped rather than read
+    _DECODES_BUFFERS = True
+except ImportError:  # the stdlib json is slower but reads the same files
+    from json import loads as _loads
+    _DECODES_BUFFERS = False
 
 __all__ = ('DOWNLOAD_DIR', 'TERGAR_DATA_DIR', 'BACKUP_AFTER_NUM_DAYS',
            'parse_date_range', 'stored_meditation_log_files', 'backed_up_log_files',
@@ -48,10 +62,58 @@ TERGAR_DATA_DIR = os.path.expanduser("~/Dropbox/data/tergar/tergar-meditation-ap
 # backup meditation logs file if the last backup is older than this many days
 BACKUP_AFTER_NUM_DAYS = 30
 
+# naive local datetimes of entries are this plus the 'date' timestamp - see the module docstring
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _any_of(patterns, flags=re.I):
+    """Returns a regex matching any of patterns, case insensitive by default.
+
+    The lastindex of a match is 1 + the index of the pattern that matched.  The
+    alternation is a zero width lookahead, so finditer() tries every position and
+    overlapping matches are found, e.g. both 'sma' and 'apcfm' in 'smapcfm'.  Only
+    the first pattern that matches at a given position is reported.
+    """
+    return re.compile("(?=" + "|".join(f"({p})" for p in patterns) + ")", flags)
+
+
+# regular expressions used to bucket entries - compiled once here rather than per entry
+# see MeditationLogs.bucket_entries
+_JOL3_WEEKS = ("W1", "W2", "W3", "W4", "W5", "W6")
+_JOL3_WEEK_RE = re.compile(r"W[1-6]")
+# Fully Being course markers - a match's lastindex is the course version, 1 or 2
+_FULLY_BEING_RE = _any_of((r"TR[- ]+FB[,\- ]", r"TR[- ]+FB2[,\- ]"))
+# the Fully Being section names are plain lowercase strings, matched with substring tests on lowercased notes
+_FB_SECTIONS = ("dropping", "four modes", "handshake", "essence love",
+                "subtle body", "calm abiding", "insight", "qualities")
+_FB2_SECTIONS = ("dropping", "handshake", "essence love", "four ways",
+                 "subtle body", "shinay", "insight", "qualities")
+_POL1_REGEX_DICT = {
+    'Four Thoughts 1': r'four[- ]+thoughts[- ]+1',
+    'Four Thoughts 2': r'four[- ]+thoughts[- ]+2',
+    'Four Thoughts 3': r'four[- ]+thoughts[- ]+3',
+    'Four Thoughts 4': r'four[- ]+thoughts[- ]+4',
+    'SMA': 'sma',
+    'APCFM': 'apcfm',
+}
+_POL1_SECTIONS = tuple(_POL1_REGEX_DICT)
+# the patterns are all lowercase and run over the already lowercased notes, so no re.I
+_POL1_SECTIONS_RE = _any_of(_POL1_REGEX_DICT.values(), flags=0)
+
 
 def _parse_date_element(e):
+    e = e.strip()
     try:
         return (datetime.today() - timedelta(days=int(e))).date()
+    except ValueError:
+        pass
+    # ISO dates are the common case and much quicker to parse than with dateutil
+    try:
+        return date.fromisoformat(e)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(e).date()
     except ValueError:
         return parse_date(e).date()
 
@@ -84,25 +146,35 @@ def parse_date_range(date_range_string):
     return date_range
 
 
+def _ls(dirpath, prefix, suffix):
+    """Paths of the files in dirpath named prefix*suffix, or [] if dirpath doesn't exist"""
+    try:
+        with os.scandir(dirpath) as entries:
+            return [e.path for e in entries if e.name.startswith(prefix) and e.name.endswith(suffix) and e.is_file()]
+    except FileNotFoundError:
+        return []
+
+
 def stored_meditation_log_files():
-    return glob.glob(os.path.join(TERGAR_DATA_DIR, "tergar-meditation-logs-20*.json"))
+    return _ls(TERGAR_DATA_DIR, "tergar-meditation-logs-20", ".json")
 
 
 def backed_up_log_files():
-    return glob.glob(os.path.join(TERGAR_DATA_DIR, "tergar-meditation-logs-backup-*"))
+    return _ls(TERGAR_DATA_DIR, "tergar-meditation-logs-backup-", ".json")
 
 
 def move_downloaded_log_files_to_storage():
-    log_files = glob.glob(os.path.join(DOWNLOAD_DIR, "tergar-meditation-logs-20*.json"))
+    log_files = _ls(DOWNLOAD_DIR, "tergar-meditation-logs-20", ".json")
     for f in log_files:
         new_name = f.replace(DOWNLOAD_DIR, TERGAR_DATA_DIR)
         print(f"moving file from {f} to {new_name}")
-        os.rename(f, new_name)
+        # unlike os.rename, this works when the download dir is on a different filesystem
+        shutil.move(f, new_name)
 
 
 def hours_minutes_seconds(seconds):
-    (mins, secs) = divmod(seconds, 60)
-    (hours, minutes) = divmod(mins, 60)
+    (hours, rem) = divmod(seconds, 3600)
+    (minutes, secs) = divmod(rem, 60)
     return (hours, minutes, secs)
 
 
@@ -113,11 +185,36 @@ def format_time(seconds, hours_width=1):
         only if there is an hours column
     :return:
     """
-    h, m, s = hours_minutes_seconds(seconds)
+    h, rem = divmod(seconds, 3600)
+    m, s = divmod(rem, 60)
     if h > 0:
-        return "{1:{0}d}:{2:02d}:{3:02d}".format(hours_width, h, m, s)
-    else:
-        return "{:d}:{:02d}".format(m, s)
+        return f"{h:{hours_width}d}:{m:02d}:{s:02d}"
+    return f"{m:d}:{s:02d}"
+
+
+@functools.lru_cache(maxsize=128)
+def _compile_search(regexp):
+    return re.compile(regexp, re.I | re.DOTALL)
+
+
+def _load_json(path):
+    """Returns the decoded contents of the json file at path"""
+    with open(path, 'rb') as fh:
+        if _DECODES_BUFFERS:
+            try:
+                mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty files can't be mapped
+                pass
+            else:
+                with mm, memoryview(mm) as buf:
+                    return _loads(buf)
+        return _loads(fh.read())
+
+
+def _render_table(title, headers, rows):
+    """Returns the titled table used for all the stats tables"""
+    table = tabulate(rows, headers=headers, tablefmt='presto', colalign=('left', 'right', 'right'))
+    return "\n".join((title, "", table))
 
 
 def check_datetimes_for_entry(entry):
@@ -127,7 +224,7 @@ def check_datetimes_for_entry(entry):
     As of now there are only a handful of entries that don't have a
     'dateString'.
     """
-    timestamp_localtime = datetime.utcfromtimestamp(entry['date'] // 1000)
+    timestamp_localtime = _EPOCH + timedelta(seconds=entry['date'] // 1000)
     if 'dateString' in entry:
         datestring_localtime = parse_date(entry['dateString'])
         if datestring_localtime == timestamp_localtime:
@@ -139,107 +236,246 @@ def check_datetimes_for_entry(entry):
         print(f'No dateString in entry: id: {entry["id"]}, timestamp: {entry["date"]} {timestamp_localtime =}')
 
 
+class _LazyMapping(MutableMapping):
+    """Mapping of a fixed set of keys to values built with build(key) the first time each key is looked up
+
+    Iterating, len() and `in` report all of keys, whether or not their values have been built yet.
+    """
+
+    def __init__(self, keys, build):
+        self._keys = keys
+        self._build = build
+        self._values = {}
+
+    def __getitem__(self, key):
+        try:
+            return self._values[key]
+        except KeyError:
+            if key not in self._keys:
+                raise
+        value = self._values[key] = self._build(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key not in self._keys:
+            raise KeyError(key)
+        self._values[key] = value
+
+    def __delitem__(self, key):
+        # the key stays, its value is built again on the next lookup
+        if key not in self._keys:
+            raise KeyError(key)
+        self._values.pop(key, None)
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+
+class _Timestamps:
+    """Read only sequence of the 'date' timestamps of a list of entries, for bisecting the list"""
+
+    def __init__(self, entries):
+        self._entries = entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getitem__(self, i):
+        return self._entries[i]['date']
+
+
 class MeditationLogs:
+    # all bucket names, in the order they are listed - see bucket_entries and the nested bucket properties
+    BUCKET_NAMES = ("jol3", "not-jol3", "custom", "jol3-by-week", "ded", "adl", "doa", "nop",
+                    "fully-being-v1", "fb-sections", "fully-being-v2", "fb2-sections", "not-any-course", "pol1")
+    # buckets that are dicts of section name -> entries, these are only built when they are used
+    NESTED_BUCKET_NAMES = ("jol3-by-week", "fb-sections", "fb2-sections", "pol1")
+
     def __init__(self, log_file):
-        entries = json.load(open(log_file))
+        entries = _load_json(log_file)
         if entries:
-            self.all_entries = sorted(entries, key=lambda e: e["date"])
+            self.all_entries = sorted(entries, key=itemgetter("date"))
         else:
             raise Exception("No entries")
-        self.buckets = {}
-        self.bucket_entries()
+        for e in self.all_entries:
+            # coerce once here so durations can be summed directly
+            e['elapsed'] = int(e.get('elapsed', 0) or 0)
+            # for case insensitive substring tests - newlines are flattened so phrases can span lines
+            e['_notes_lower'] = (e.get('notes') or '').replace('\n', ' ').lower()
+            # few distinct codes - interned so == with the literals in bucket_entries hits the identity fast path
+            course = e.get('course')
+            if course and isinstance(course.get('code'), str):
+                course['code'] = sys.intern(course['code'])
+        # buckets are only built when they are first looked up, so e.g. a search doesn't bucket anything
+        self.buckets = _LazyMapping(self.BUCKET_NAMES, self._build_bucket)
+        # (number of sessions, total seconds) for each bucket - nested buckets have a dict of these
+        self.bucket_stats = _LazyMapping(self.BUCKET_NAMES, self._bucket_stats)
 
     def bucket_entries(self):
-        # jol3 and not-jol3 should partition the complete set of logs
-        self.buckets["jol3"] = [e for e in self.all_entries if e["course"].get("code") == "JOL3"]
-        self.buckets["not-jol3"] = [e for e in self.all_entries if e["course"].get("code") != "JOL3"]
-        # breaking change to json format on Mar 21, 2022
-        # see file ./tergar-breaking-changes
-        # old 'Custom' course entries still have a 'code' field
-        # but the new ones don't, so add them
-        self.buckets["custom"] = [e for e in self.all_entries if e["course"].get("code") == "CUSTOM"]
+        """Fill all the buckets that aren't nested in a single pass over the entries"""
+        buckets = {name: [] for name in self.BUCKET_NAMES if name not in self.NESTED_BUCKET_NAMES}
+
         for e in self.all_entries:
-            if ('code' not in e['course']) and e['course'].get('name') == 'Custom':
-                self.buckets['custom'].append(e)
+            course = e.get("course") or {}
+            code = course.get("code")
+            notes = e.get("notes") or ""
+            # jol3 and not-jol3 should partition the complete set of logs
+            if code == "JOL3":
+                buckets["jol3"].append(e)
+            else:
+                buckets["not-jol3"].append(e)
+            # breaking change to json format on Mar 21, 2022
+            # see file ./tergar-breaking-changes
+            # old 'Custom' course entries still have a 'code' field
+            # but the new ones don't, so add them
+            is_custom = code == "CUSTOM" or ("code" not in course and course.get("name") == "Custom")
+            if is_custom:
+                buckets["custom"].append(e)
+            # whether the entry belongs to any of the courses tracked in the custom course
+            in_course = False
+            # Nectar of the Path
+            if code == "NECTAR_PATH":
+                buckets["nop"].append(e)
+                in_course = True
+            if not notes:
+                if is_custom and not in_course:
+                    buckets["not-any-course"].append(e)
+                continue
+            # Dying Every Day Course
+            if "DED" in notes:
+                buckets["ded"].append(e)
+                in_course = True
+            # Awakening in Daily Life Course
+            if "ADL" in notes:
+                buckets["adl"].append(e)
+                in_course = True
+            # Dying and Awakening Course - DOA nickname
+            if "DOA" in notes:
+                buckets["doa"].append(e)
+                in_course = True
+            fully_being_versions = {m.lastindex for m in _FULLY_BEING_RE.finditer(notes)}
+            # Tsoknyi Rinpoche - Fully Being - v1 - the original course
+            if 1 in fully_being_versions:
+                buckets["fully-being-v1"].append(e)
+                in_course = True
+            # Tsoknyi Rinpoche - Fully Being - v2 - Oct 2021
+            if 2 in fully_being_versions:
+                buckets["fully-being-v2"].append(e)
+                in_course = True
+            if is_custom and not in_course:
+                buckets["not-any-course"].append(e)
+        self.buckets.update(buckets)
+
+    def _build_bucket(self, name):
+        """Build a bucket the first time it is looked up in self.buckets
+
+        The flat buckets are all filled at once by bucket_entries().  Each nested bucket is a
+        cached property named after the bucket, e.g. 'fb-sections' -> self.fb_sections
+        """
+        if name in self.NESTED_BUCKET_NAMES:
+            return getattr(self, name.replace('-', '_'))
+        if name not in self.BUCKET_NAMES:
+            raise KeyError(name)
+        self.bucket_entries()
+        return self.buckets[name]
+
+    def _bucket_stats(self, name):
+        bucket = self.buckets[name]
+        if isinstance(bucket, dict):
+            return {section: (len(entries), MeditationLogs.total_duration_seconds(entries))
+                    for section, entries in bucket.items()}
+        return len(bucket), MeditationLogs.total_duration_seconds(bucket)
+
+    def _sections(self, bucket_name, sections, sections_re):
+        """Returns dict of section name -> entries in bucket_name whose notes match the section
+
+        sections_re - regex made by _any_of() with one pattern for each section, in the same order,
+                      matched against the lowercased notes
+        """
+        by_section = {section: [] for section in sections}
+        for e in self.buckets[bucket_name]:
+            for section in {sections[m.lastindex - 1] for m in sections_re.finditer(e['_notes_lower'])}:
+                by_section[section].append(e)
+        return by_section
+
+    def _literal_sections(self, bucket_name, sections):
+        """Returns dict of section name -> entries in bucket_name whose notes contain the section
+
+        sections - lowercase strings, matched case insensitively
+        """
+        by_section = {section: [] for section in sections}
+        for e in self.buckets[bucket_name]:
+            notes_lower = e['_notes_lower']
+            for section in sections:
+                if section in notes_lower:
+                    by_section[section].append(e)
+        return by_section
+
+    @functools.cached_property
+    def jol3_by_week(self):
         # these buckets are based on my convention of putting W1 through W6 for the week of the course
         # and therefore the different meditations since each week introduced a new method
-        self.buckets["jol3-by-week"] = {}
-        for bucket in ("W1", "W2", "W3", "W4", "W5", "W6"):
-            self.buckets["jol3-by-week"][bucket] = [e for e in self.buckets["jol3"] if
-                                                    e.get("notes") and bucket in e["notes"]]
-        # Dying Every Day Course
-        self.buckets["ded"] = [e for e in self.all_entries if e.get("notes") and "DED" in e["notes"]]
-        # Awakening in Daily Life Course
-        self.buckets["adl"] = [e for e in self.all_entries if e.get("notes") and "ADL" in e["notes"]]
-        # Dying and Awakening Course - DOA nickname
-        self.buckets["doa"] = [e for e in self.all_entries if e.get("notes") and "DOA" in e["notes"]]
-        # Nectar of the Path
-        self.buckets["nop"] = [e for e in self.all_entries if e["course"].get("code") == "NECTAR_PATH"]
-        # Tsoknyi Rinpoche - Fully Being - v1 - the original course
-        self.buckets["fully-being-v1"] = [e for e in self.all_entries
-                                       if e.get("notes") and re.search(r"TR[- ]+FB[,\- ]", e["notes"], re.I)]
-        self.buckets["fb-sections"] = {}
-        for section in ("dropping", "four modes", "handshake", "essence love",
-                        "subtle body", "calm abiding", "insight", "qualities"):
-            self.buckets["fb-sections"][section] = [e for e in self.buckets["fully-being-v1"]
-                                                    if re.search(section, e["notes"].replace('\n', ' '), re.I)]
-        # Tsoknyi Rinpoche - Fully Being - v2 - Oct 2021
-        self.buckets["fully-being-v2"] = [e for e in self.all_entries
-                                          if e.get("notes") and re.search(r"TR[- ]+FB2[,\- ]", e["notes"], re.I)]
-        self.buckets["fb2-sections"] = {}
-        for section in ("dropping", "handshake", "essence love", "four ways",
-                        "subtle body", "shinay", "insight", "qualities"):
-            self.buckets["fb2-sections"][section] = [e for e in self.buckets["fully-being-v2"]
-                                                    if re.search(section, e["notes"].replace('\n', ' '), re.I)]
-
-        _custom_course_combined = (self.buckets["ded"] + self.buckets["adl"] + self.buckets["doa"] + self.buckets["nop"]
-                                    + self.buckets["fully-being-v1"] + self.buckets["fully-being-v1"])
-        self.buckets["not-any-course"] = [entry for entry in self.all_entries
-                                          if entry in self.buckets["custom"]
-                                          and entry not in _custom_course_combined]
-        self.buckets['pol1'] = {}
-        bucket_regex_dict = {
-            'Four Thoughts 1': r'four[- ]+thoughts[- ]+1',
-            'Four Thoughts 2': r'four[- ]+thoughts[- ]+2',
-            'Four Thoughts 3': r'four[- ]+thoughts[- ]+3',
-            'Four Thoughts 4': r'four[- ]+thoughts[- ]+4',
-            'SMA': 'sma',
-            'APCFM': 'apcfm',
-        }
-        for section in bucket_regex_dict:
-            self.buckets['pol1'][section] = [
-                e for e in self.buckets['nop']
-                if e['notes'] and re.search(bucket_regex_dict[section], e['notes'].replace('\n', ' '), re.I)
-            ]
+        by_week = {week: [] for week in _JOL3_WEEKS}
+        for e in self.buckets["jol3"]:
+            for week in set(_JOL3_WEEK_RE.findall(e.get("notes") or "")):
+                by_week[week].append(e)
+        return by_week
+
+    @functools.cached_property
+    def fb_sections(self):
+        return self._literal_sections("fully-being-v1", _FB_SECTIONS)
+
+    @functools.cached_property
+    def fb2_sections(self):
+        return self._literal_sections("fully-being-v2", _FB2_SECTIONS)
+
+    @functools.cached_property
+    def pol1(self):
+        return self._sections("nop", _POL1_SECTIONS, _POL1_SECTIONS_RE)
 
     def search_notes(self, regexp, bucket=None, return_full_entries=False, date_range=None):
         """Return notes matching regex search (case insensitive, multiline)
 
-        bucket - if set only search notes in self.buckets[bucket]
+        regexp - regex string, or an already compiled re.Pattern which is used as is
+        bucket - if set only search notes in self.buckets[bucket], for a nested bucket the entries in any section
         return_full_entries - if True return the full log entries
         date_range - sequence (date, date) which represent and inclusive date range to limit data to
         Default - returns a list of the "notes" key value of the entry dicts
         """
-        regex = re.compile(regexp, re.I | re.DOTALL)
         entries_to_search = self.buckets[bucket] if bucket else self.all_entries
-        entries_found = []
+        if isinstance(entries_to_search, dict):
+            # nested bucket - an entry can be in several sections, search each once and keep date order
+            unique = {id(e): e for section in entries_to_search.values() for e in section}
+            entries_to_search = sorted(unique.values(), key=itemgetter("date"))
         if date_range:
-            beginning = datetime.combine(date_range[0], time())
-            ending = datetime.combine(date_range[1], time(23, 59, 59))
-            for entry in entries_to_search:
-                entry_date = datetime.utcfromtimestamp(entry['date'] // 1000)
-                if entry.get('notes') and beginning <= entry_date <= ending and regex.search(entry['notes']):
-                    entries_found.append(entry)
+            # 'date' timestamps are ms for the local time as if it were utc, see the module docstring on datetimes
+            start = calendar.timegm(date_range[0].timetuple()) * 1000
+            # end of the last day - adding a day to the date would overflow for date.max
+            end = calendar.timegm(date_range[1].timetuple()) * 1000 + 86_400_000
+            # all_entries and every bucket are sorted by date, so the range is a slice
+            timestamps = _Timestamps(entries_to_search)
+            entries_to_search = entries_to_search[bisect_left(timestamps, start):bisect_left(timestamps, end)]
+        if isinstance(regexp, str) and re.escape(regexp) == regexp:
+            # no regex metacharacters or whitespace (re.escape escapes both), so a substring test on the
+            # lowercased notes finds the same entries
+            needle = regexp.lower()
+            found = [e for e in entries_to_search if (notes := e['_notes_lower']) and needle in notes]
         else:
-            entries_found = [e for e in self.all_entries if e.get("notes") and regex.search(e['notes'])]
+            search = (regexp if isinstance(regexp, re.Pattern) else _compile_search(regexp)).search
+            found = [e for e in entries_to_search if (notes := e.get('notes')) and search(notes)]
         if return_full_entries:
-            return entries_found
-        return [e.get("notes") for e in entries_found]
+            return found
+        return [e['notes'] for e in found]
 
     @staticmethod
     def total_duration_seconds(entries):
-        elapsed_list = [e.get("elapsed") for e in entries]
-        return sum(int(x) for x in elapsed_list)
+        return sum(e["elapsed"] for e in entries)
 
     @staticmethod
     def most_recent(bucket):
@@ -253,7 +489,8 @@ class MeditationLogs:
         try:
             date_string = entry.get('dateString')
             if not date_string:
-                date_string = str(datetime.utcfromtimestamp(entry['date'] // 1000))
+                # the local datetime from the timestamp - see the module docstring on datetimes
+                date_string = str(_EPOCH + timedelta(seconds=entry['date'] // 1000))
             str_list = [
                 "{:<21}{:>7}{:>14}    {}".format(date_string, format_time(entry.get("elapsed", 0)), course,
                                                  entry.get("id")),
@@ -268,18 +505,13 @@ class MeditationLogs:
     # returns (week name, number of entries, total seconds of meditation for that week) for each week
     def jol3_by_week_totals(self):
         returns = []
-        for week in self.buckets['jol3-by-week']:
-            returns.append((week,
-                            len(self.buckets['jol3-by-week'][week]),
-                            format_time(MeditationLogs.total_duration_seconds(self.buckets['jol3-by-week'][week]),
-                                        hours_width=2)))
+        for week in self.bucket_stats['jol3-by-week']:
+            returns.append((week, *self._number_of_sessions_and_duration('jol3-by-week', week, hours_width=2)))
         return returns
 
     def jol3_stats_string(self):
         header = "JOL 3 Meditation"
-        overall = "Total sessions: {}, Total Time: {}".format(
-            len(self.buckets["jol3"]),
-            format_time(MeditationLogs.total_duration_seconds(self.buckets["jol3"])))
+        overall = "Total sessions: {}, Total Time: {}".format(*self._number_of_sessions_and_duration("jol3"))
         weeks_header = "By Weeks:\n{:6}{:12}{}".format("Week", "Sessions", "Time")
         weeks = "\n".join(["{:>3}{:>8}{:>13}".format(t[0], t[1], t[2]) for t in self.jol3_by_week_totals()])
         return "\n".join((header, overall, weeks_header, weeks))
@@ -288,29 +520,27 @@ class MeditationLogs:
         title = "Joy of Living 3    (add 20-30 hours before tracking)"
         headers = ["Week", "Sessions", "Total Time"]
         table = self.jol3_by_week_totals()
-        table.append(("Total", len(self.buckets["jol3"]),
-                      format_time(MeditationLogs.total_duration_seconds(self.buckets["jol3"]))))
-        return f"{title}\n\n{tabulate(table, headers=headers, tablefmt='presto', colalign=('left', 'right', 'right'))}"
+        table.append(("Total", *self._number_of_sessions_and_duration("jol3")))
+        return _render_table(title, headers, table)
 
-    def _number_of_sessions_and_duration(self, bucket_name):
-        return (len(self.buckets[bucket_name]),
-                format_time(MeditationLogs.total_duration_seconds(self.buckets[bucket_name])))
+    def _number_of_sessions_and_duration(self, bucket_name, section=None, hours_width=1):
+        """Returns (number of sessions, formatted total time) for a bucket or a section of a nested bucket"""
+        n, seconds = self.bucket_stats[bucket_name][section] if section else self.bucket_stats[bucket_name]
+        return n, format_time(seconds, hours_width=hours_width)
 
     def bardo_courses_table(self):
         """Returns string table"""
         title = "Bardo Courses"
         headers = ["Course", "Sessions", "Total Time"]
         # headers = ["DED", "ADL", "DOA", "Bardo Total"]
+        bardo_stats = [self.bucket_stats[name] for name in ("ded", "adl", "doa")]
         table = [["DED", *self._number_of_sessions_and_duration("ded")],
                  ["ADL", *self._number_of_sessions_and_duration("adl")],
                  ["DOA", *self._number_of_sessions_and_duration("doa")],
-                 ["Total", len(self.buckets["ded"] + self.buckets["adl"] + self.buckets["doa"]),
-                  format_time(MeditationLogs.total_duration_seconds(
-                      self.buckets["ded"] + self.buckets["adl"] + self.buckets["doa"]
-                  ))],
+                 ["Total", sum(n for n, _ in bardo_stats), format_time(sum(seconds for _, seconds in bardo_stats))],
                  ]
 
-        return f"{title}\n\n{tabulate(table, headers=headers, tablefmt='presto', colalign=('left', 'right', 'right'))}"
+        return _render_table(title, headers, table)
 
     def general_table(self):
         """General stats, also NOP"""
@@ -321,7 +551,7 @@ class MeditationLogs:
                  ["Overall Meditation", len(self.all_entries),
                   format_time(MeditationLogs.total_duration_seconds(self.all_entries))]]
 
-        return f"{title}\n\n{tabulate(table, headers=headers, tablefmt='presto', colalign=('left', 'right', 'right'))}"
+        return _render_table(title, headers, table)
 
     def fully_being_v1_table(self):
         """Tsoknyi Rinpoche's Fully Being - version 1 of the course"""
@@ -331,14 +561,12 @@ class MeditationLogs:
         for section in ("Dropping", "Four Modes", "Handshake", "Essence Love",
                         "Subtle Body", "Calm Abiding", "Insight", "Qualities"):
             section_bucket = section.lower()
-            if section_bucket in self.buckets["fb-sections"] and len(self.buckets["fb-sections"][section_bucket]) > 0:
-                table.append([section,
-                              len(self.buckets["fb-sections"][section_bucket]),
-                              format_time(MeditationLogs.total_duration_seconds(
-                                  self.buckets["fb-sections"][section_bucket]))])
+            if section_bucket in self.bucket_stats["fb-sections"] \
+                    and self.bucket_stats["fb-sections"][section_bucket][0] > 0:
+                table.append([section, *self._number_of_sessions_and_duration("fb-sections", section_bucket)])
         table.append(["Total", *self._number_of_sessions_and_duration("fully-being-v1")])
 
-        return f"{title}\n\n{tabulate(table, headers=headers, tablefmt='presto', colalign=('left', 'right', 'right'))}"
+        return _render_table(title, headers, table)
 
     def fully_being_v2_table(self):
         """Tsoknyi Rinpoche's Fully Being - version 2 of the course - Oct 2021
@@ -372,69 +600,75 @@ class MeditationLogs:
         for section in ("Dropping", "Handshake", "Essence Love", "Four Ways",
                         "Subtle Body", "Shinay", "Insight", "Qualities"):
             section_bucket = section.lower()
-            if section_bucket in self.buckets["fb2-sections"] and len(self.buckets["fb2-sections"][section_bucket]) > 0:
-                table.append([section,
-                              len(self.buckets["fb2-sections"][section_bucket]),
-                              format_time(MeditationLogs.total_duration_seconds(
-                                  self.buckets["fb2-sections"][section_bucket]))])
+            if section_bucket in self.bucket_stats["fb2-sections"] \
+                    and self.bucket_stats["fb2-sections"][section_bucket][0] > 0:
+                table.append([section, *self._number_of_sessions_and_duration("fb2-sections", section_bucket)])
         table.append(["Total", *self._number_of_sessions_and_duration("fully-being-v2")])
 
-        return f"{title}\n\n{tabulate(table, headers=headers, tablefmt='presto', colalign=('left', 'right', 'right'))}"
+        return _render_table(title, headers, table)
 
     def path_of_liberation_table(self):
         title = "POL 1 - NOP"
         headers = ["Section", "Sessions", "Total Time"]
         table = []
-        all_pol1_nop_sessions = []
+        # totals of the Four Thoughts sections
+        total_sessions, total_seconds = 0, 0
         for section in ("Four Thoughts 1", "Four Thoughts 2", "Four Thoughts 3", "Four Thoughts 4",
                         "SMA", "APCFM"):
-            if section in self.buckets["pol1"] and len(self.buckets["pol1"][section]) > 0:
+            if section in self.bucket_stats["pol1"] and self.bucket_stats["pol1"][section][0] > 0:
                 if re.search('thoughts', section, re.I):
-                    all_pol1_nop_sessions.extend(self.buckets['pol1'][section])
-                table.append([section,
-                              len(self.buckets["pol1"][section]),
-                              format_time(MeditationLogs.total_duration_seconds(
-                                  self.buckets["pol1"][section]))])
-        table.append(["Total", len(all_pol1_nop_sessions),
-                      format_time(MeditationLogs.total_duration_seconds(all_pol1_nop_sessions))])
+                    total_sessions += self.bucket_stats["pol1"][section][0]
+                    total_seconds += self.bucket_stats["pol1"][section][1]
+                table.append([section, *self._number_of_sessions_and_duration("pol1", section)])
+        table.append(["Total", total_sessions, format_time(total_seconds)])
 
-        return f"{title}\n\n{tabulate(table, headers=headers, tablefmt='presto', colalign=('left', 'right', 'right'))}"
+        return _render_table(title, headers, table)
 
 
-def clean_up_old_files():
-    """Save 2 most recent meditation log files"""
-    log_files = stored_meditation_log_files()
+def clean_up_old_files(log_files=None):
+    """Save 2 most recent meditation log files
+
+    log_files - the stored meditation log files if already listed, so the directory isn't listed again
+    """
+    if log_files is None:
+        log_files = stored_meditation_log_files()
     if len(log_files) > 2:
-        for i, f in enumerate(sorted(log_files)[:-2]):
+        keep = heapq.nlargest(2, log_files)
+        old_files = [f for f in log_files if f not in keep]
+        for f in old_files:
             os.remove(f)
-        print("removed old files: {}".format(i + 1))
+        print("removed old files: {}".format(len(old_files)))
 
 
-def latest_log():
-    log_files = stored_meditation_log_files()
-    if log_files:
-        return sorted(log_files)[-1]
+def latest_log(log_files=None):
+    """log_files - the stored meditation log files if already listed, so the directory isn't listed again"""
+    return max(stored_meditation_log_files() if log_files is None else log_files, default=None)
 
 
 def datetime_from_filename(filename):
     """Returns datetime with no tz"""
-    datetime_str = re.search(r'(\d{4}.*)-\d\d\.\d\d.json', filename).groups()[0]
+    # names end with a fixed width timestamp from the extension, e.g. 2022-04-01T10.20.30-05.00.json,
+    # so slice out the part before the utc offset
+    datetime_str = filename[-len('2022-04-01T10.20.30-05.00.json'):-len('-05.00.json')]
     return datetime.strptime(datetime_str, '%Y-%m-%dT%H.%M.%S')
 
 
-def backup_logs():
+def backup_logs(log_files=None):
     """Backup logs every month.
 
     Later we can add logic to check backups and remove them as necessary.
+    log_files - the stored meditation log files if already listed, so the directory isn't listed again
     :raise IndexError if there are no existing backups
     """
     latest_backup = sorted(backed_up_log_files())[-1]
     latest_backup_date = datetime_from_filename(latest_backup)
     if datetime.now() - latest_backup_date >= timedelta(days=BACKUP_AFTER_NUM_DAYS):
-        backup_filename = latest_log().replace('tergar-meditation-logs', 'tergar-meditation-logs-backup')
-        shutil.copy(latest_log(), backup_filename)
+        log_file = latest_log(log_files)
+        backup_filename = log_file.replace('tergar-meditation-logs', 'tergar-meditation-logs-backup')
+        # contents only, the backup doesn't need the permission bits
+        shutil.copyfile(log_file, backup_filename)
         print(f"last backup older than {BACKUP_AFTER_NUM_DAYS} days, backing up:")
-        print(f"{latest_log()} ->\n{backup_filename}\n")
+        print(f"{log_file} ->\n{backup_filename}\n")
 
 
 def count_lung_breathing(ml: MeditationLogs) -> (int, int):
@@ -471,26 +705,40 @@ def main():
                         help='print count of lung breathing/vase breathing')
     args = parser.parse_args()
 
+    # memory profiling is only imported and started when asked for, tracemalloc slows down every allocation
     if args.memory_stats:
+        import tracemalloc
+        try:
+            import resource
+        except ImportError:  # unix only
+            resource = None
         tracemalloc.start()
 
     move_downloaded_log_files_to_storage()
-    log_file = latest_log()
+    log_files = stored_meditation_log_files()
+    log_file = latest_log(log_files)
     if not log_file:
         print(f"No downloaded meditation logs in {TERGAR_DATA_DIR} or {DOWNLOAD_DIR}")
         return
-    clean_up_old_files()
-    backup_logs()
+    # the latest log is never removed, so the listing stays good for the backup
+    clean_up_old_files(log_files)
+    backup_logs(log_files)
     print("meditation log file: {}\n".format(log_file))
 
-
+    # bucket names are fixed, so listing them doesn't need the log loaded
+    list_buckets_only = args.list_buckets and not (args.search or args.search_bucket)
     date_range = parse_date_range(args.date_range) if args.date_range else None
-    ml = MeditationLogs(log_file)
+    ml = None if list_buckets_only else MeditationLogs(log_file)
 
     if args.memory_stats:
         print('Memory stats:')
-        memory_mb = psutil.Process().memory_info().rss / (1024 **2)
-        print(f'Process resident memory:  {memory_mb:.3f} MiB')
+        if resource:
+            # ru_maxrss is in bytes on macOS and KiB on Linux
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            memory_mb = max_rss / (1024 ** 2) if sys.platform == 'darwin' else max_rss / 1024
+            print(f'Process peak resident memory:  {memory_mb:.3f} MiB')
+        else:
+            print('Process peak resident memory:  unavailable on this platform')
 
         ## example of displaying lines of source code that allocate the largest
         ## amount of memory
@@ -507,6 +755,10 @@ def main():
 
         tracemalloc.stop()
 
+    if list_buckets_only:
+        print(", ".join(MeditationLogs.BUCKET_NAMES))
+        return
+
     if args.search_bucket:
         print(f"Search_bucket: {args.search_bucket}")
         if args.full_logs:
@@ -544,10 +796,6 @@ def main():
             print('\n'.join(notes))
         return
 
-    elif args.list_buckets:
-        print(", ".join(ml.buckets.keys()))
-        return
-
     elif args.lung_breathing:
         print('Lung Breathing:\nSessions:  Count:\n{:>8}{:>8}'.format(*count_lung_breathing(ml)))
         return